@@ -5,183 +5,819 @@ Complete standalone version with all required classes
 """
 
 import os
+import sys
+import time
 import json
 import cmd
+import mmap
+import codecs
+import queue
+import atexit
 import shutil
+import platform
+import threading
+import subprocess
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
 from anthropic import Anthropic
 from dotenv import load_dotenv
 import mimetypes
 import re
 
+try:
+    import orjson  # Optional: much faster JSON encode/decode
+except ImportError:
+    orjson = None
+
+try:
+    import tiktoken  # Optional: real BPE token counts instead of the heuristic
+except ImportError:
+    tiktoken = None
+
 # Load environment variables
 load_dotenv()
 
+# Conversation files embed their timestamp: conversation_YYYYMMDD_HHMMSS.json
+_CONV_RE = re.compile(r'conversation_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})\.json')
+# Saved conversations write 'timestamp' as their first key
+_CONV_TS_RE = re.compile(rb'\A\s*\{\s*"timestamp"\s*:\s*"([^"\\]*)"')
+
+# Available Claude models (read-only)
+_MODEL_MAP = MappingProxyType({
+    'opus': sys.intern('claude-opus-4-20250514'),
+    'sonnet': sys.intern('claude-3-5-sonnet-20241022'),
+    'haiku': sys.intern('claude-3-haiku-20240307'),
+})
+_MODEL_NAMES = frozenset(_MODEL_MAP)
+
+# Size units for _format_size, one per power of 1024
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Row layouts for the file, artifact and token tables, shared by headers and rows
+_FILE_ROW = "{:<40} {:>10} {}".format          # name, size, modified
+_ARTIFACT_ROW = "{:<50} {:>10} {}".format      # name, size, modified
+_TOKEN_ROW = "{} {:<38} {:>11,} {:>10}".format  # indicator, name, tokens, size
+
+# Timestamp formats: filename suffixes, listing "Modified" columns, conversation lists
+_TS_FMT = "%Y%m%d_%H%M%S"
+_MTIME_FMT = "%Y-%m-%d %H:%M"
+_CONV_LIST_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Chat messages that only ask which files exist ("list files", "what files
+# do I have?") are answered from names and sizes, without file contents
+_LISTING_RE = re.compile(
+    r'^\s*(?:list(?:\s+(?:all|the|my|our))*\s+(?:project\s+)?files'
+    r'|(?:what|which)\s+files\s+(?:do\s+(?:i|we)\s+have|are\s+(?:there|here|included)))'
+    r'(?:\s+(?:in|of)\s+(?:this|the|my|our)\s+project)?\s*[?.!]*\s*$',
+    re.I
+)
+
+# File-manager command used by open_project_folder on this platform
+_OPEN_CMD = {'Darwin': 'open', 'Windows': 'explorer'}.get(platform.system(), 'xdg-open')
+
+# Upper bound on concurrent file reads when building project context
+_READ_WORKERS = 8
+
+# Text files larger than this are decoded straight from a memory map
+_MMAP_THRESHOLD = 1024 * 1024
+
+# Token counts for text files larger than this are taken from a memory map,
+# one window at a time
+_MMAP_TOKEN_THRESHOLD = 256 * 1024
+_TOKEN_WINDOW = 1024 * 1024
+
+# Extensions always treated as text, checked before falling back to mimetypes
+_TEXT_EXTS = frozenset({
+    '.txt', '.md', '.tex', '.py', '.js', '.html', '.css', '.json', '.xml',
+    '.yaml', '.yml', '.ts', '.rs', '.go', '.c', '.h', '.cpp',
+    '.ini', '.toml', '.cfg', '.sh',
+})
+
+# Artifact extraction patterns: fenced code blocks with a language tag,
+# and the first class/function name used as an artifact title
+_CODE_BLOCK_RE = re.compile(r'```(\w+)\n([\s\S]*?)```')
+_CLASS_RE = re.compile(r'class\s+(\w+)')
+_TITLE_RE = re.compile(r'class\s+(?P<cls>\w+)|def\s+(?P<fn>\w+)')
+
+# Help texts
+_HELP = """
+🎯 Claude Projects Enhanced CLI - Command Reference
+================================================
+
+PROJECT MANAGEMENT:
+  create <name>         - Create a new project
+  open <name>           - Open existing project
+  projects              - List all projects
+  summary               - Show project statistics
+
+FILE MANAGEMENT:
+  add <path>            - Add file to project
+  files                 - List project files
+  remove <filename>     - Remove file from project
+  update                - Sync files from directory
+  view <filename>       - View file or artifact content
+
+TOKEN MANAGEMENT:
+  tokens                - Show token analysis for all files
+  
+CHAT & AI:
+  chat <message>        - Chat with Claude about your project
+  chat -n <message>     - Chat without file context
+  chat -s files -- msg  - Chat with specific files only
+  model <name>          - Switch model (opus/sonnet/haiku)
+  models                - List available models
+
+ARTIFACTS:
+  artifacts             - List all artifacts
+  export artifacts <p>  - Export artifacts to directory
+  clear_artifacts       - Remove all artifacts
+  
+UTILITIES:
+  conversations         - List chat history
+  open_project_folder   - Open in file manager
+  clear                 - Clear screen
+  exit/quit            - Exit CLI
+
+HELP:
+  help                  - Show this message
+  help <command>        - Detailed help for command
+  help_chat            - Chat command options
+  help_artifacts       - Artifact management help
+
+💡 Quick Start:
+  1. create my_project
+  2. add file1.py file2.py
+  3. tokens  (check token usage)
+  4. chat Analyze this code
+"""
+
+_HELP_CHAT = """
+💬 Chat Command Options:
+========================
+
+BASIC USAGE:
+  chat <message>                    - Chat with all project files included
+
+TOKEN-AWARE OPTIONS:
+  chat -n <message>                 - No file context (fastest, no token limit issues)
+  chat -s file1,file2 -- <message>  - Include only specific files
+  
+INPUT OPTIONS:
+  chat -f <filename>                - Read message from a file in your project
+  chat -m                           - Multi-line mode (end with 'EOF')
+
+EXAMPLES:
+  chat Tell me about this code
+  chat -n What are TBI assessment best practices?
+  chat -s main.py,utils.py -- Analyze these two files
+  chat -f long_prompt.txt
+  chat -m
+  ... Type your multi-line
+  ... message here
+  EOF
+
+TOKEN MANAGEMENT:
+  Use 'tokens' command to see which files use the most tokens
+  Token limit: 200,000 (including ~2,000 for system prompts)
+
+💡 TIP: If you hit token limits, use -n or -s options to control context
+"""
+
+_ARTIFACT_HELP = """
+📦 Artifact Management Commands:
+================================
+
+VIEW & LIST:
+  view <filename>         - View any file or artifact content
+  list                    - List all files AND artifacts
+  artifacts              - List only artifacts with details
+  files                  - List only project files
+
+EXPORT & MANAGE:
+  export artifacts <path> - Export all artifacts to a directory
+  export files <path>    - Export all project files to a directory
+  clear_artifacts        - Remove all artifacts (with confirmation)
+
+QUICK ACCESS:
+  open_project_folder    - Open project folder in file manager
+
+EXAMPLES:
+  view llmprovider_20250802_161611.python    # View an artifact
+  export artifacts ~/Desktop/my_code         # Export to Desktop
+  list                                       # See everything
+
+💡 TIP: Artifacts are stored in: Claude_Projects/<project_name>/artifacts/
+"""
+
+
+def _read_json(path: Path) -> Any:
+    """Load a JSON document from disk"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _write_json(path: Path, obj: Any, indent: bool = True):
+    """Write a JSON document to disk (UTF-8; 2-space indented unless indent=False)"""
+    if orjson:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2) if indent else orjson.dumps(obj)
+    elif indent:
+        data = json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    else:
+        data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+@lru_cache(maxsize=2048)
+def _format_size(size: int) -> str:
+    """Format file size in human-readable format"""
+    idx = min((size.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1) if size > 0 else 0
+    return f"{size / (1 << (idx * 10)):.1f} {_SIZE_UNITS[idx]}"
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """The cl100k_base encoding, loaded on first use (None without tiktoken)"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None  # e.g. encoding data not cached and no network
+
+
+def _estimator_name() -> str:
+    """Which estimator produced token counts, so persisted counts can be validated"""
+    return "tiktoken:cl100k_base" if _get_tokenizer() is not None else "heuristic"
+
+
+def _estimate_tokens(text: str) -> int:
+    """Estimate token count (BPE count with tiktoken, else a rough approximation)"""
+    encoding = _get_tokenizer()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _heuristic_tokens(len(text.split()), len(text))
+
+
+def _heuristic_tokens(word_count: int, char_count: int) -> int:
+    """Rough token estimate from word and character counts"""
+    # Rough estimation: ~4 characters per token on average
+    # This is a simplified approach, actual tokenization is more complex
+    # Use a weighted average of word and character counts
+    # Most tokens are ~0.75 words or ~4 characters
+    return int((word_count / 0.75 + char_count / 4) / 2)
+
+
+def _count_tokens_mmap(path: str) -> Tuple[int, int]:
+    """Estimate (tokens, characters) of a UTF-8 file, decoding 1 MB windows of an mmap"""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    encoding = _get_tokenizer()
+    tokens = words = chars = 0
+    split_word = False
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        size = len(m)
+        for start in range(0, size, _TOKEN_WINDOW):
+            end = min(start + _TOKEN_WINDOW, size)
+            text = decoder.decode(m[start:end], end == size)
+            if not text:
+                continue
+            chars += len(text)
+            if encoding is not None:
+                tokens += len(encoding.encode(text, disallowed_special=()))
+            else:
+                words += len(text.split())
+                # A word straddling the window boundary was counted in both windows
+                if split_word and not text[0].isspace():
+                    words -= 1
+                split_word = not text[-1].isspace()
+    if encoding is None:
+        tokens = _heuristic_tokens(words, chars)
+    return tokens, chars
+
+
+# Memoized variant for a chat's message and context
+_estimate_tokens_cached = lru_cache(maxsize=2)(_estimate_tokens)
+
+
+def _scan_dir(path: Path, inodes: Optional[Dict[str, int]] = None) -> List[Tuple[str, int, int]]:
+    """Scan a directory once: sorted (name, size, mtime_ns) for each regular file
+    
+    If inodes is given, it is filled with name -> inode number for each file.
+    """
+    files = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                st = entry.stat()
+                files.append((entry.name, st.st_size, st.st_mtime_ns))
+                if inodes is not None:
+                    inodes[entry.name] = st.st_ino
+    files.sort(key=itemgetter(0))
+    return files
+
+
+def _copy_file_range(infd: int, outfd: int, blocksize: int) -> int:
+    """Copy infd to outfd until EOF with copy_file_range (in-kernel, may reflink)"""
+    total = 0
+    while True:
+        copied = os.copy_file_range(infd, outfd, blocksize)
+        if copied == 0:
+            return total
+        total += copied
+
+
+def _sendfile(infd: int, outfd: int, blocksize: int) -> int:
+    """Copy infd to outfd until EOF with sendfile (in-kernel)"""
+    total = 0
+    while True:
+        copied = os.sendfile(outfd, infd, total, blocksize)
+        if copied == 0:
+            return total
+        total += copied
+
+
+def _fast_copy(src: Path, dst: Path, keep_stat: bool = True):
+    """Copy a file (like shutil.copy2), moving the bytes in-kernel where supported
+    
+    With keep_stat=False only the contents are copied (like shutil.copyfile).
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(infd).st_size
+        # Files reporting size 0 (procfs, sysfs, some FUSE mounts) may still
+        # have contents; those are always copied with plain reads
+        kernel_copies = (_copy_file_range, _sendfile) if size else ()
+        blocksize = max(size, 8 * 1024 * 1024)
+        for kernel_copy in kernel_copies:
+            try:
+                if kernel_copy(infd, outfd, blocksize):
+                    break
+            except (AttributeError, OSError):
+                pass
+            # Unsupported here (platform, kernel, cross-device) or nothing
+            # was copied: start over
+            os.lseek(infd, 0, os.SEEK_SET)
+            os.lseek(outfd, 0, os.SEEK_SET)
+            os.ftruncate(outfd, 0)
+        else:
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+    if keep_stat:
+        shutil.copystat(src, dst)
+
+
+# Artifact files are written by one background thread shared by all
+# projects, started on first use; failed writes are reported by
+# _flush_artifacts on the main thread
+_artifact_queue: "queue.Queue[Tuple[str, str, bytes]]" = queue.Queue()
+_artifact_errors: List[Tuple[str, OSError]] = []
+_artifact_writer: Optional[threading.Thread] = None
+
+
+def _queue_artifact(filepath: str, filename: str, data: bytes):
+    """Hand an artifact file to the writer thread"""
+    global _artifact_writer
+    if _artifact_writer is None:
+        _artifact_writer = threading.Thread(target=_drain_artifacts, daemon=True)
+        _artifact_writer.start()
+        atexit.register(_flush_artifacts)
+    _artifact_queue.put((filepath, filename, data))
+
+
+def _drain_artifacts():
+    """Writer thread: write queued artifacts to disk"""
+    while True:
+        filepath, filename, data = _artifact_queue.get()
+        try:
+            with open(filepath, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            _artifact_errors.append((filename, e))
+        finally:
+            _artifact_queue.task_done()
+
+
+def _flush_artifacts():
+    """Block until all queued artifact writes have finished, then report failures"""
+    _artifact_queue.join()
+    while _artifact_errors:
+        filename, e = _artifact_errors.pop(0)
+        print(f"⚠️  Could not write artifact {filename}: {e}")
+
 
 class Project:
     """Manages project files and conversations"""
     
+    __slots__ = (
+        'name', 'base_path', 'project_path', 'files_path', 'conversations_path',
+        'metadata_path', 'token_cache_path', 'metadata', '_metadata_dirty', '_ctx_cache',
+        '_body_cache', '_content_cache', '_token_cache', '_token_cache_dirty',
+    )
+    
+    # Caps on how much file content is inlined into the chat context
+    MAX_PER_FILE_BYTES = 32 * 1024
+    MAX_TOTAL_CONTEXT_BYTES = 512 * 1024
+    
     def __init__(self, name: str, base_path: Optional[Path] = None):
-        self.name = name
+        self.name = sys.intern(name)
         self.base_path = base_path or Path.cwd() / "Claude_Projects"
         self.project_path = self.base_path / name
         self.files_path = self.project_path / "files"
         self.conversations_path = self.project_path / "conversations"
         self.metadata_path = self.project_path / "metadata.json"
+        self.token_cache_path = self.project_path / ".token_cache.json"
         
         # Create directory structure
         self.files_path.mkdir(parents=True, exist_ok=True)
         self.conversations_path.mkdir(exist_ok=True)
         
         self.metadata = self._load_metadata()
+        # Metadata and token-cache changes are written by flush()
+        self._metadata_dirty = False
+        self._token_cache_dirty = False
+        
+        # (fingerprint, context, (name, body) sections, skipped-files note,
+        # included count, truncated names, skipped names) from the last
+        # get_project_context call
+        self._ctx_cache: Optional[Tuple[tuple, str, List[Tuple[str, str]], str,
+                                        int, List[str], List[str]]] = None
+        # filename -> ((size, mtime_ns, limit), body) for each file in that context,
+        # so a rebuild only re-reads files that changed
+        self._body_cache: Dict[str, Tuple[Tuple[int, int, Optional[int]], str]] = {}
+        # filename -> (size, mtime_ns, content) from get_file_content
+        self._content_cache: Dict[str, Tuple[int, int, str]] = {}
+        # filename -> (size, mtime_ns, tokens, chars) from get_file_tokens,
+        # persisted across sessions in token_cache_path and loaded on first use
+        self._token_cache: Optional[Dict[str, Tuple[int, int, int, int]]] = None
     
     def add_file(self, filepath: Path) -> str:
         """Add a file to the project"""
-        if not filepath.exists():
-            raise FileNotFoundError(f"File not found: {filepath}")
+        try:
+            src_st = os.stat(filepath)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {filepath}") from None
+        
+        now = datetime.now()
         
         # Copy file to project
         dest = self.files_path / filepath.name
-        if dest.exists():
+        if os.path.exists(dest):
             # Add timestamp to avoid overwriting
             stem = filepath.stem
             suffix = filepath.suffix
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = now.strftime(_TS_FMT)
             dest = self.files_path / f"{stem}_{timestamp}{suffix}"
         
-        shutil.copy2(filepath, dest)
+        # Mode and times are not needed: metadata records its own 'added' time
+        _fast_copy(filepath, dest, keep_stat=False)
+        self._ctx_cache = None
         
         # Update metadata
         self.metadata['files'][dest.name] = {
-            'added': datetime.now().isoformat(),
+            'added': now.isoformat(),
             'original_path': str(filepath),
-            'size': dest.stat().st_size
+            'size': src_st.st_size
         }
-        self._save_metadata()
+        self._metadata_dirty = True
         
         return dest.name
     
     def remove_file(self, filename: str) -> bool:
         """Remove a file from the project"""
-        filepath = self.files_path / filename
-        if filepath.exists():
-            filepath.unlink()
-            if filename in self.metadata['files']:
-                del self.metadata['files'][filename]
-                self._save_metadata()
-            return True
-        return False
+        try:
+            os.unlink(self.files_path / filename)
+        except FileNotFoundError:
+            return False
+        
+        self._ctx_cache = None
+        self._content_cache.pop(filename, None)
+        if self._token_cache and self._token_cache.pop(filename, None):
+            self._token_cache_dirty = True
+        if filename in self.metadata['files']:
+            del self.metadata['files'][filename]
+            self._metadata_dirty = True
+        return True
+    
+    def _scan_files(self, inodes: Optional[Dict[str, int]] = None) -> List[Tuple[str, int, int]]:
+        """Scan the files directory once: sorted (name, size, mtime_ns) per file"""
+        return _scan_dir(self.files_path, inodes)
     
     def list_files(self) -> List[Tuple[str, int, str]]:
         """List all project files with details"""
-        files = []
-        for filepath in sorted(self.files_path.iterdir()):
-            if filepath.is_file():
-                size = filepath.stat().st_size
-                modified = datetime.fromtimestamp(filepath.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-                files.append((filepath.name, size, modified))
-        return files
+        strftime, localtime = time.strftime, time.localtime
+        return [(name, size, strftime(_MTIME_FMT, localtime(mtime_ns / 1e9)))
+                for name, size, mtime_ns in self._scan_files()]
     
     def get_file_content(self, filename: str) -> str:
         """Get content of a text file"""
         filepath = self.files_path / filename
-        if not filepath.exists():
-            raise FileNotFoundError(f"File not found: {filename}")
-        
-        # Determine if file is text
-        mime_type, _ = mimetypes.guess_type(str(filepath))
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {filename}") from None
+        
+        # Serve unchanged files from memory; size + mtime_ns detect edits
+        cached = self._content_cache.get(filename)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        
+        is_text, mime_type = self._detect_text(str(filepath))
+        if is_text:
+            # Large files are decoded from a memory map
+            with open(filepath, 'rb') as f:
+                if st.st_size > _MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as mv:
+                        content = str(mv, 'utf-8', 'replace')
+                else:
+                    content = f.read().decode('utf-8', 'replace')
+        else:
+            content = f"[Binary file: {filename} ({mime_type or 'unknown type'})]"
+        self._content_cache[filename] = (st.st_size, st.st_mtime_ns, content)
+        return content
+    
+    def get_file_tokens(self, filename: str, stat_key: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+        """Estimated (tokens, characters) of a file, cached until it changes
         
-        if mime_type and mime_type.startswith('text'):
-            return filepath.read_text()
-        elif filepath.suffix in ['.txt', '.md', '.tex', '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml']:
-            return filepath.read_text()
+        stat_key is the file's (size, mtime_ns) if already known from a scan.
+        """
+        if stat_key is None:
+            st = os.stat(self.files_path / filename)
+            stat_key = (st.st_size, st.st_mtime_ns)
+        token_cache = self._loaded_token_cache()
+        cached = token_cache.get(filename)
+        if cached and cached[:2] == stat_key:
+            return cached[2], cached[3]
+        
+        path = os.path.join(self.files_path, filename)
+        if stat_key[0] > _MMAP_TOKEN_THRESHOLD and self._detect_text(path)[0]:
+            # Large text file: count from a memory map, one window at a time
+            tokens, chars = _count_tokens_mmap(path)
         else:
-            return f"[Binary file: {filename} ({mime_type or 'unknown type'})]"
+            content = self.get_file_content(filename)
+            tokens, chars = _estimate_tokens(content), len(content)
+        token_cache[filename] = (*stat_key, tokens, chars)
+        self._token_cache_dirty = True
+        return tokens, chars
+    
+    def token_counts(self) -> List[Tuple[str, int, int, Optional[str]]]:
+        """(name, tokens, characters, error) for every file, from one scan and the token cache
+        
+        Only files added or modified since they were last counted are read;
+        a file that cannot be read counts as 0 tokens with the error message set.
+        """
+        def count(entry: Tuple[str, int, int]) -> Tuple[str, int, int, Optional[str]]:
+            name, size, mtime_ns = entry
+            try:
+                return (name, *self.get_file_tokens(name, (size, mtime_ns)), None)
+            except Exception as e:
+                return (name, 0, 0, str(e))
+        
+        entries = self._scan_files()
+        token_cache = self._loaded_token_cache()
+        # Forget counts for files deleted outside the CLI
+        gone = token_cache.keys() - {e[0] for e in entries}
+        for name in gone:
+            del token_cache[name]
+        if gone:
+            self._token_cache_dirty = True
+        
+        stale = [e for e in entries if token_cache.get(e[0], ())[:2] != e[1:]]
+        if len(stale) > 1:
+            # Count changed files concurrently; the pass below reads them from the cache
+            with ThreadPoolExecutor(max_workers=min(_READ_WORKERS, len(stale))) as pool:
+                list(pool.map(count, stale))
+        return [count(e) for e in entries]
+    
+    def _detect_text(self, filepath: str) -> Tuple[bool, Optional[str]]:
+        """Determine if a file is text; also returns the guessed MIME type"""
+        if os.path.splitext(filepath)[1].lower() in _TEXT_EXTS:
+            return True, None
+        
+        mime_type, _ = mimetypes.guess_type(filepath)
+        return bool(mime_type and mime_type.startswith('text')), mime_type
     
     def save_conversation(self, messages: List[Dict], response: str) -> str:
         """Save a conversation to disk"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"conversation_{timestamp}.json"
+        now = datetime.now()
+        filename = f"conversation_{now.strftime(_TS_FMT)}.json"
         
         conversation = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'messages': messages,
             'response': response
         }
         
         filepath = self.conversations_path / filename
-        with open(filepath, 'w') as f:
-            json.dump(conversation, f, indent=2)
+        _write_json(filepath, conversation, indent=False)
         
         return filename
     
     def list_conversations(self) -> List[Tuple[str, str]]:
         """List all conversations"""
+        with os.scandir(self.conversations_path) as it:
+            names = sorted((e.name for e in it if e.name.endswith('.json')), reverse=True)
+        
         conversations = []
-        for filepath in sorted(self.conversations_path.iterdir(), reverse=True):
-            if filepath.suffix == '.json':
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                timestamp = data.get('timestamp', 'Unknown')
-                conversations.append((filepath.name, timestamp))
+        for name in names:
+            # Take the timestamp from the filename, else from the file itself
+            match = _CONV_RE.fullmatch(name)
+            if match:
+                timestamp = "{}-{}-{} {}:{}:{}".format(*match.groups())
+            else:
+                timestamp = self._read_conversation_timestamp(self.conversations_path / name)
+                try:
+                    timestamp = datetime.fromisoformat(timestamp).strftime(_CONV_LIST_FMT)
+                except (TypeError, ValueError):
+                    pass  # Not an ISO timestamp (e.g. 'Unknown'): show as stored
+            conversations.append((name, timestamp))
         return conversations
     
-    def get_project_context(self) -> str:
-        """Generate context from all project files - ONLY from current project"""
-        context_parts = [f"Project: {self.name}\n{'='*60}\n"]
-        context_parts.append("Files in this project:\n")
+    def _read_conversation_timestamp(self, filepath: Path) -> str:
+        """Read only the timestamp of a conversation file"""
+        # 'timestamp' is normally the first key; otherwise decode the whole document
+        with open(filepath, 'rb') as f:
+            head = f.read(256)
+        match = _CONV_TS_RE.match(head)
+        if match:
+            return match.group(1).decode('utf-8', 'replace')
+        return _read_json(filepath).get('timestamp', 'Unknown')
+    
+    def get_project_context(self) -> Tuple[str, int, List[str], List[str]]:
+        """Generate context from all project files - ONLY from current project
         
+        Returns (context, included, truncated, skipped): the number of files
+        included, the names of text files cut to MAX_PER_FILE_BYTES, and the
+        names of files left out once MAX_TOTAL_CONTEXT_BYTES was reached.
+        """
         # ONLY read files from THIS project's files directory
-        for filepath in sorted(self.files_path.iterdir()):
-            if filepath.is_file():
-                context_parts.append(f"\n--- File: {filepath.name} ---\n")
-                try:
-                    content = self.get_file_content(filepath.name)
-                    context_parts.append(content)
-                except Exception as e:
-                    context_parts.append(f"[Error reading file: {e}]")
-                context_parts.append("\n")
-        
-        if len(list(self.files_path.iterdir())) == 0:
-            context_parts.append("(No files in project yet)\n")
+        inodes = {} if os.name == 'posix' else None
+        entries = self._scan_files(inodes)
+        
+        # Reuse the last context if no file was added, removed or modified
+        fingerprint = tuple(entries)
+        if self._ctx_cache and self._ctx_cache[0] == fingerprint:
+            return (self._ctx_cache[1], *self._ctx_cache[4:])
+        
+        header = f"Project: {self.name}\n{'='*60}\nFiles in this project:\n"
+        
+        # Empty project: nothing to plan, read or assemble
+        if not entries:
+            context = header + "(No files in project yet)\n"
+            self._ctx_cache = (fingerprint, context, [], "", 0, [], [])
+            self._body_cache = {}
+            return context, 0, [], []
+        
+        # Plan each file's byte budget up front
+        files_dir = os.fspath(self.files_path)
+        plan = []
+        keys = []
+        total = 0
+        truncated = []
+        skipped = []
+        for name, size, mtime_ns in entries:
+            remaining = self.MAX_TOTAL_CONTEXT_BYTES - total
+            if remaining <= 0:
+                skipped.append(name)
+                continue
+            
+            path = os.path.join(files_dir, name)
+            is_text, mime_type = self._detect_text(path)
+            limit = min(self.MAX_PER_FILE_BYTES, remaining) if is_text else None
+            if is_text:
+                total += min(size, limit)
+                if size > limit:
+                    truncated.append(name)
+            plan.append((name, path, size, limit, mime_type))
+            keys.append((size, mtime_ns, limit))
+        
+        # Reuse bodies of files unchanged since the last build; only the rest are read
+        bodies: List[str] = [""] * len(plan)
+        order = []
+        for i, key in enumerate(keys):
+            hit = self._body_cache.get(plan[i][0])
+            if hit and hit[0] == key:
+                bodies[i] = hit[1]
+            else:
+                order.append(i)
+        
+        # Read changed files concurrently (in inode order on POSIX); output stays by name
+        if inodes:
+            order.sort(key=lambda i: inodes[plan[i][0]])
+        if order:
+            with ThreadPoolExecutor(max_workers=min(_READ_WORKERS, len(order))) as pool:
+                for i, body in zip(order, pool.map(self._read_context_section, [plan[i] for i in order])):
+                    bodies[i] = body
+        self._body_cache = {item[0]: (key, body) for item, key, body in zip(plan, keys, bodies)}
+        
+        parts = [header]
+        sections = []
+        for (name, _, _, _, _), body in zip(plan, bodies):
+            parts.extend(("\n--- File: ", name, " ---\n", body, "\n"))
+            sections.append((name, body))
+        
+        note = ""
+        if skipped:
+            note = f"[Context size limit reached - skipped {len(skipped)} files: {', '.join(skipped)}]"
+            parts.extend(("\n", note, "\n"))
+        
+        context = "".join(parts)
+        self._ctx_cache = (fingerprint, context, sections, note, len(plan), truncated, skipped)
+        return context, len(plan), truncated, skipped
+    
+    def get_context_sections(self) -> Tuple[List[Tuple[str, str]], str]:
+        """(filename, content) pairs behind the last get_project_context result
         
-        return "".join(context_parts)
+        Returns (sections, note); note says which files were skipped for size, if any.
+        """
+        if not self._ctx_cache:
+            return [], ""
+        return self._ctx_cache[2], self._ctx_cache[3]
+    
+    def get_file_listing(self) -> str:
+        """Generate a compact context with file names and sizes only"""
+        lines = [f"Project: {self.name}\n{'='*60}\n", "Files in this project (names and sizes only):\n"]
+        files = self._scan_files()
+        for name, size, _ in files:
+            lines.append(f"- {name} ({size:,} bytes)\n")
+        if not files:
+            lines.append("(No files in project yet)\n")
+        return "".join(lines)
+    
+    def _read_context_section(self, item: Tuple[str, str, int, Optional[int], Optional[str]]) -> str:
+        """Read one planned file body for get_project_context"""
+        name, path, size, limit, mime_type = item
+        if limit is None:
+            return f"[Binary file: {name} ({mime_type or 'unknown type'})]"
+        try:
+            return self._read_bounded(path, size, limit).decode("utf-8", "replace")
+        except Exception as e:
+            return f"[Error reading file: {e}]"
+    
+    def _read_bounded(self, path: str, size: int, limit: int) -> bytes:
+        """Read a file, keeping only its head and tail if it exceeds limit bytes"""
+        with open(path, 'rb') as f:
+            if size <= limit:
+                return f.read()
+            half = limit // 2
+            head = f.read(half + 1)
+            f.seek(size - half)
+            tail = f.read(half)
+        # Cut both parts on UTF-8 character boundaries: a continuation byte
+        # (0b10xxxxxx) never starts a character
+        end = min(half, len(head) - 1)
+        while end > max(0, half - 3) and head[end] & 0xC0 == 0x80:
+            end -= 1
+        head = head[:end]
+        start = 0
+        while start < min(3, len(tail)) and tail[start] & 0xC0 == 0x80:
+            start += 1
+        tail = tail[start:]
+        marker = f"\n... [truncated {size - len(head) - len(tail):,} bytes] ...\n".encode()
+        return head + marker + tail
     
     def sync_files(self) -> List[str]:
         """Sync metadata with actual files in the files directory"""
         synced = []
+        scanned = self._scan_files()
+        present = {name for name, _, _ in scanned}
         
         # Remove metadata for files that no longer exist
-        files_to_remove = []
-        for filename in self.metadata['files']:
-            if not (self.files_path / filename).exists():
-                files_to_remove.append(filename)
+        files_to_remove = [f for f in self.metadata['files'] if f not in present]
         
         for filename in files_to_remove:
             del self.metadata['files'][filename]
+            self._content_cache.pop(filename, None)
+            if self._token_cache and self._token_cache.pop(filename, None):
+                self._token_cache_dirty = True
         
         # Add metadata for new files
-        for filepath in self.files_path.iterdir():
-            if filepath.is_file() and filepath.name not in self.metadata['files']:
-                self.metadata['files'][filepath.name] = {
-                    'added': datetime.now().isoformat(),
+        added = datetime.now().isoformat()
+        for name, size, _ in scanned:
+            if name not in self.metadata['files']:
+                self.metadata['files'][name] = {
+                    'added': added,
                     'original_path': 'manually_added',
-                    'size': filepath.stat().st_size
+                    'size': size
                 }
-                synced.append(filepath.name)
+                synced.append(name)
         
         if files_to_remove or synced:
-            self._save_metadata()
+            self._ctx_cache = None
+            self._metadata_dirty = True
         
         return synced
     
     def _load_metadata(self) -> Dict:
         """Load project metadata"""
         if self.metadata_path.exists():
-            with open(self.metadata_path, 'r') as f:
-                return json.load(f)
+            return _read_json(self.metadata_path)
         return {
             'created': datetime.now().isoformat(),
             'files': {},
@@ -191,8 +827,34 @@ class Project:
     def _save_metadata(self):
         """Save project metadata"""
         self.metadata['updated'] = datetime.now().isoformat()
-        with open(self.metadata_path, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+        _write_json(self.metadata_path, self.metadata)
+    
+    def _loaded_token_cache(self) -> Dict[str, Tuple[int, int, int, int]]:
+        """The token cache, read from token_cache_path on first use"""
+        if self._token_cache is None:
+            self._token_cache = self._load_token_cache()
+        return self._token_cache
+    
+    def _load_token_cache(self) -> Dict[str, Tuple[int, int, int, int]]:
+        """Load persisted token counts, if they were made by the current estimator"""
+        try:
+            data = _read_json(self.token_cache_path)
+        except (OSError, ValueError):
+            return {}
+        if data.get('estimator') != _estimator_name():
+            return {}
+        return {name: tuple(entry) for name, entry in data.get('files', {}).items()}
+    
+    def flush(self):
+        """Save project metadata and token counts if they changed since the last save"""
+        if self._metadata_dirty:
+            self._save_metadata()
+            self._metadata_dirty = False
+        if self._token_cache_dirty:
+            _write_json(self.token_cache_path,
+                        {'estimator': _estimator_name(), 'files': self._token_cache},
+                        indent=False)
+            self._token_cache_dirty = False
 
 
 class ClaudeCLI(cmd.Cmd):
@@ -212,11 +874,7 @@ Type 'help' for commands or 'help <command>' for details.
     prompt = '(claude) > '
     
     # Available Claude models
-    MODELS = {
-        'opus': 'claude-opus-4-20250514',
-        'sonnet': 'claude-3-5-sonnet-20241022',
-        'haiku': 'claude-3-haiku-20240307'
-    }
+    MODELS = _MODEL_MAP
     
     def __init__(self):
         super().__init__()
@@ -231,18 +889,23 @@ Type 'help' for commands or 'help <command>' for details.
             self.client = Anthropic(api_key=api_key)
         
         self.current_project: Optional[Project] = None
+        # Per-project lookups cached by _set_project
+        self._is_enhanced = False
+        self._artifacts_path: Optional[Path] = None
         self.projects_base = Path.cwd() / "Claude_Projects"
         self.projects_base.mkdir(exist_ok=True)
         
         # Load or set default model
         self.settings_file = self.projects_base / ".settings.json"
         self.current_model = self._load_settings().get('model', 'opus')
+        self._settings_dirty = False
+        atexit.register(self._flush_settings)
+        atexit.register(self._flush_project)
     
     def _load_settings(self) -> Dict:
         """Load CLI settings"""
         if self.settings_file.exists():
-            with open(self.settings_file, 'r') as f:
-                return json.load(f)
+            return _read_json(self.settings_file)
         return {'model': 'opus'}
     
     def _save_settings(self):
@@ -251,8 +914,18 @@ Type 'help' for commands or 'help <command>' for details.
             'model': self.current_model,
             'updated': datetime.now().isoformat()
         }
-        with open(self.settings_file, 'w') as f:
-            json.dump(settings, f, indent=2)
+        _write_json(self.settings_file, settings)
+    
+    def _flush_settings(self):
+        """Save CLI settings if they changed since the last save"""
+        if self._settings_dirty:
+            self._save_settings()
+            self._settings_dirty = False
+    
+    def _flush_project(self):
+        """Write the current project's pending state (before a switch and at exit)"""
+        if self.current_project:
+            self.current_project.flush()
     
     def do_create(self, name: str):
         """Create a new project: create <project_name>"""
@@ -260,8 +933,8 @@ Type 'help' for commands or 'help <command>' for details.
             print("❌ Please provide a project name")
             return
         
-        self.current_project = Project(name)
-        self.prompt = f'({name}) > '
+        self._flush_project()
+        self._set_project(Project(name))
         print(f"✅ Created project: {name}")
         
         # Check if files already exist in the directory
@@ -280,8 +953,8 @@ Type 'help' for commands or 'help <command>' for details.
             print(f"❌ Project '{name}' not found")
             return
         
-        self.current_project = Project(name)
-        self.prompt = f'({name}) > '
+        self._flush_project()
+        self._set_project(Project(name))
         print(f"✅ Opened project: {name}")
         
         # Auto-sync files
@@ -289,9 +962,17 @@ Type 'help' for commands or 'help <command>' for details.
         if synced:
             print(f"📂 Auto-loaded {len(synced)} files from project directory")
     
+    def _set_project(self, project: Project):
+        """Make project the current one and cache its per-project lookups"""
+        self.current_project = project
+        self.prompt = f'({project.name}) > '
+        self._is_enhanced = isinstance(project, EnhancedProject)
+        self._artifacts_path = project.artifact_manager.artifacts_path if self._is_enhanced else None
+    
     def do_projects(self, _):
         """List all projects"""
-        projects = [p.name for p in self.projects_base.iterdir() if p.is_dir() and not p.name.startswith('.')]
+        with os.scandir(self.projects_base) as it:
+            projects = [e.name for e in it if e.is_dir() and not e.name.startswith('.')]
         if projects:
             print("\n📁 Available projects:")
             for project in sorted(projects):
@@ -326,11 +1007,10 @@ Type 'help' for commands or 'help <command>' for details.
         files = self.current_project.list_files()
         if files:
             print(f"\n📄 Files in {self.current_project.name}:")
-            print(f"{'Name':<40} {'Size':>10} {'Modified'}")
+            print(_FILE_ROW('Name', 'Size', 'Modified'))
             print("-" * 65)
-            for name, size, modified in files:
-                size_str = self._format_size(size)
-                print(f"{name:<40} {size_str:>10} {modified}")
+            sys.stdout.write("".join([_FILE_ROW(name, _format_size(size), modified) + "\n"
+                                      for name, size, modified in files]))
         else:
             print("No files in project. Add with: add <filepath>")
     
@@ -342,13 +1022,13 @@ Type 'help' for commands or 'help <command>' for details.
             return
         
         model_name = model_name.lower()
-        if model_name not in self.MODELS:
+        if model_name not in _MODEL_NAMES:
             print(f"❌ Unknown model: {model_name}")
             print("Available models: " + ", ".join(self.MODELS.keys()))
             return
         
         self.current_model = model_name
-        self._save_settings()
+        self._settings_dirty = True
         print(f"✅ Switched to {model_name} ({self.MODELS[model_name]})")
     
     def do_chat(self, message: str):
@@ -364,8 +1044,9 @@ Type 'help' for commands or 'help <command>' for details.
         # Get ONLY current project context
         context = ""
         if self.current_project:
-            context = self.current_project.get_project_context()
-            print(f"📎 Including {len(self.current_project.list_files())} files from '{self.current_project.name}' project only")
+            context, file_count, truncated, skipped = self.current_project.get_project_context()
+            print(f"📎 Including {file_count} files from '{self.current_project.name}' project only")
+            self._print_context_limits(truncated, skipped)
         else:
             print("⚠️  No project open - chatting without file context")
         
@@ -378,14 +1059,20 @@ Type 'help' for commands or 'help <command>' for details.
         
         try:
             model_id = self.MODELS[self.current_model]
-            response = self.client.messages.create(
+            print(f"\n🤖 Claude ({self.current_model}):")
+            
+            # Stream the reply so text shows up as soon as it is generated
+            with self.client.messages.stream(
                 model=model_id,
                 max_tokens=4096,
                 messages=[{"role": "user", "content": full_message}]
-            )
+            ) as stream:
+                for text in stream.text_stream:
+                    self._print_stream(text)
+                response = stream.get_final_message()
             
             response_text = response.content[0].text
-            print(f"\n🤖 Claude ({self.current_model}):\n{response_text}\n")
+            print("\n")
             
             # Save conversation if in a project
             if self.current_project:
@@ -395,22 +1082,30 @@ Type 'help' for commands or 'help <command>' for details.
                 )
                 print(f"💾 Conversation saved: {conv_file}")
                 
+        except KeyboardInterrupt:
+            print("\n❌ Cancelled")
         except Exception as e:
             print(f"❌ Error: {e}")
     
+    def _print_context_limits(self, truncated: List[str], skipped: List[str]):
+        """Tell the user which files the context size caps cut or left out"""
+        if truncated:
+            print(f"✂️  Trimmed the middle of {len(truncated)} files over "
+                  f"{self.current_project.MAX_PER_FILE_BYTES // 1024} KB: {', '.join(truncated)}")
+        if skipped:
+            print(f"⚠️  Context size limit ({self.current_project.MAX_TOTAL_CONTEXT_BYTES // 1024} KB) reached - "
+                  f"skipped {len(skipped)} files: {', '.join(skipped)}")
+    
+    def _print_stream(self, text: str):
+        """Write a chunk of streamed response text immediately"""
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    
     def do_exit(self, _):
         """Exit the CLI"""
         print("👋 Goodbye!")
         return True
     
-    def _format_size(self, size: int) -> str:
-        """Format file size in human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
-    
     def do_open_project_folder(self, _):
         """Open the current project folder in your file manager"""
         if not self.current_project:
@@ -419,21 +1114,14 @@ Type 'help' for commands or 'help <command>' for details.
         
         project_path = self.current_project.project_path
         
-        import platform
-        import subprocess
-        
-        system = platform.system()
         try:
-            if system == "Darwin":  # macOS
-                subprocess.run(["open", str(project_path)])
-            elif system == "Windows":
-                subprocess.run(["explorer", str(project_path)])
-            else:  # Linux
-                subprocess.run(["xdg-open", str(project_path)])
+            # Fire and forget: the file manager runs on without blocking the CLI
+            subprocess.Popen([_OPEN_CMD, str(project_path)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print(f"✅ Opened project folder: {project_path}")
         except Exception as e:
             print(f"❌ Could not open folder: {e}")
-            print(f"📁 Project path: {project_path.absolute()}")
+            print(f"📁 Project path: {os.path.abspath(project_path)}")
     
     def do_quit(self, arg):
         """Exit the CLI"""
@@ -484,28 +1172,41 @@ class EnhancedAnthropicClient:
 
 Remember: Your responses should be as comprehensive and helpful as those on the Claude.ai website, with the same level of detail and formatting."""
 
-    def __init__(self, api_key: str):
-        self.client = Anthropic(api_key=api_key)
-        
-    def create_message_with_context(self, message: str, context: str, model: str) -> Dict[str, Any]:
-        """Create a message that mimics website behavior"""
+    def __init__(self, api_key: Optional[str] = None, client: Optional[Anthropic] = None):
+        # Reuse an existing client if given
+        self.client = client or Anthropic(api_key=api_key)
+        
+    def create_message_with_context(self, message: str, sections: List[Tuple[str, str]],
+                                    model: str,
+                                    on_text: Optional[Callable[[str], None]] = None,
+                                    plain_context: str = "") -> Dict[str, Any]:
+        """Create a message that mimics website behavior
+        
+        If on_text is given, the response is streamed and each text chunk is
+        passed to it as it arrives; the final assembled message is returned.
+        sections are the (filename, content) pairs to share, each sent in
+        its own code block; pass an empty list for no files.
+        plain_context is sent as is after the file sections, outside any code block.
+        """
         
         # Format the context similar to how the website might present it
-        formatted_context = self._format_file_context(context)
+        context_parts = self._section_parts(sections)
+        if plain_context:
+            context_parts.extend(("\n\n", plain_context) if context_parts else (plain_context,))
         
         # Combine system prompt with user message
-        full_message = f"""{self.WEBSITE_SYSTEM_PROMPT}
-
-User has shared the following project files:
-
-{formatted_context}
+        full_message = "".join([
+            f"{self.WEBSITE_SYSTEM_PROMPT}\n\nUser has shared the following project files:\n\n",
+            *context_parts,
+            f"""
 
 User's question: {message}
 
-Please provide a comprehensive response that matches the quality and detail level of responses on the Claude.ai website. Include code improvements if applicable."""
+Please provide a comprehensive response that matches the quality and detail level of responses on the Claude.ai website. Include code improvements if applicable.""",
+        ])
 
         # Use parameters that likely match the website
-        response = self.client.messages.create(
+        params = dict(
             model=model,
             max_tokens=8192,  # Larger token limit for comprehensive responses
             temperature=0.7,   # Balanced temperature for detailed but coherent responses
@@ -517,40 +1218,24 @@ Please provide a comprehensive response that matches the quality and detail leve
             ]
         )
         
-        return response
-    
-    def _format_file_context(self, context: str) -> str:
-        """Format file context to match website presentation"""
-        # Parse the context to extract file information
-        lines = context.split('\n')
-        formatted = []
-        current_file = None
-        file_content = []
-        
-        for line in lines:
-            if line.startswith('--- File:') and line.endswith('---'):
-                # Save previous file if exists
-                if current_file and file_content:
-                    formatted.append(f"**File: {current_file}**")
-                    formatted.append("```python")
-                    formatted.extend(file_content)
-                    formatted.append("```")
-                    formatted.append("")
-                
-                # Extract new file name
-                current_file = line.replace('--- File:', '').replace('---', '').strip()
-                file_content = []
-            elif current_file and line.strip():
-                file_content.append(line)
-        
-        # Don't forget the last file
-        if current_file and file_content:
-            formatted.append(f"**File: {current_file}**")
-            formatted.append("```python")
-            formatted.extend(file_content)
-            formatted.append("```")
+        if on_text is None:
+            return self.client.messages.create(**params)
         
-        return '\n'.join(formatted)
+        with self.client.messages.stream(**params) as stream:
+            for text in stream.text_stream:
+                on_text(text)
+            return stream.get_final_message()
+    
+    def _section_parts(self, sections: List[Tuple[str, str]]) -> List[str]:
+        """Format (filename, content) pairs to match website presentation, as unjoined pieces"""
+        parts = []
+        for name, content in sections:
+            body = content.strip('\r\n')
+            if body.strip():
+                if parts:
+                    parts.append("\n\n")
+                parts.extend((f"**File: {name}**\n```python\n", body, "\n```"))
+        return parts
 
 
 class ArtifactManager:
@@ -559,44 +1244,47 @@ class ArtifactManager:
     def __init__(self, project_path: Path):
         self.artifacts_path = project_path / "artifacts"
         self.artifacts_path.mkdir(exist_ok=True)
+        # Directory prefix for artifact paths
+        self._base = os.path.join(os.fspath(self.artifacts_path), '')
         
-    def create_artifact(self, content: str, language: str, title: str) -> Dict[str, Any]:
+    def create_artifact(self, content: str, language: str, title: str,
+                        now: Optional[datetime] = None) -> Dict[str, Any]:
         """Create an artifact similar to website behavior"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = now or datetime.now()
+        timestamp = now.strftime(_TS_FMT)
         filename = f"{title.lower().replace(' ', '_')}_{timestamp}.{language}"
         
-        filepath = self.artifacts_path / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        filepath = self._base + filename
+        _queue_artifact(filepath, filename, content.encode('utf-8'))
             
         return {
             'filename': filename,
-            'path': str(filepath),
+            'path': filepath,
             'language': language,
             'title': title,
-            'created': datetime.now().isoformat()
+            'created': now.isoformat()
         }
     
     def extract_code_blocks(self, response_text: str) -> List[Dict[str, Any]]:
         """Extract code blocks from response to create artifacts"""
         artifacts = []
+        now = None  # shared by every artifact from this response
         
-        # Pattern to match code blocks with language specification
-        code_pattern = r'```(\w+)\n(.*?)```'
-        matches = re.finditer(code_pattern, response_text, re.DOTALL)
-        
-        for i, match in enumerate(matches):
-            language = match.group(1)
-            code = match.group(2)
-            
+        for i, match in enumerate(_CODE_BLOCK_RE.finditer(response_text)):
             # Skip small code snippets
+            start, end = match.span(2)
+            if end - start < 100:
+                continue
+            code = match.group(2)
             if len(code.strip()) < 100:
                 continue
+            language = match.group(1)
                 
             # Try to extract a title from the code or context
             title = self._extract_title(code, language, i)
             
-            artifact = self.create_artifact(code, language, title)
+            now = now or datetime.now()
+            artifact = self.create_artifact(code, language, title, now)
             artifacts.append(artifact)
             
         return artifacts
@@ -604,18 +1292,19 @@ class ArtifactManager:
     def _extract_title(self, code: str, language: str, index: int) -> str:
         """Extract a meaningful title from code"""
         # Look for class or function definitions
-        if language == 'python':
-            class_match = re.search(r'class\s+(\w+)', code)
-            if class_match:
-                return class_match.group(1)
-            func_match = re.search(r'def\s+(\w+)', code)
-            if func_match:
-                return func_match.group(1)
+        if language == 'python' and ('class' in code or 'def' in code):
+            # A class name wins over a function name, wherever it appears
+            match = _TITLE_RE.search(code)
+            if match:
+                if match.group('cls'):
+                    return match.group('cls')
+                class_match = _CLASS_RE.search(code, match.start())
+                return class_match.group(1) if class_match else match.group('fn')
                 
         # Look for a comment at the top
-        lines = code.strip().split('\n')
-        if lines and lines[0].startswith('#'):
-            return lines[0].strip('# ').replace('_', ' ').title()
+        first_line = code.strip().partition('\n')[0]
+        if first_line.startswith('#'):
+            return first_line.strip('# ').replace('_', ' ').title()
             
         return f"Code_Artifact_{index + 1}"
 
@@ -623,30 +1312,32 @@ class ArtifactManager:
 class EnhancedProject(Project):
     """Enhanced project with artifact support"""
     
+    __slots__ = ('artifact_manager',)
+    
     def __init__(self, name: str, base_path: Optional[Path] = None):
         super().__init__(name, base_path)
         self.artifact_manager = ArtifactManager(self.project_path)
         
-    def save_enhanced_conversation(self, message: str, response: str, artifacts: List[Dict]) -> str:
+    def save_enhanced_conversation(self, message: str, response: str, artifacts: List[Dict],
+                                   word_count: Optional[int] = None) -> str:
         """Save conversation with artifacts information"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"conversation_{timestamp}.json"
+        now = datetime.now()
+        filename = f"conversation_{now.strftime(_TS_FMT)}.json"
         
         conversation = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'message': message,
             'response': response,
             'artifacts': artifacts,
             'metadata': {
                 'response_length': len(response),
                 'has_code_artifacts': len(artifacts) > 0,
-                'word_count': len(response.split())
+                'word_count': word_count if word_count is not None else len(response.split())
             }
         }
         
         filepath = self.conversations_path / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(conversation, f, indent=2, ensure_ascii=False)
+        _write_json(filepath, conversation, indent=False)
         
         return filename
 
@@ -670,21 +1361,25 @@ Type 'help' for commands or 'help <command>' for details.
     def __init__(self):
         super().__init__()
         
-        # Use enhanced client if API key is available
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if api_key:
-            self.enhanced_client = EnhancedAnthropicClient(api_key)
+        # Use enhanced client if API key is available, sharing the base client
+        if self.client:
+            self.enhanced_client = EnhancedAnthropicClient(client=self.client)
         else:
             self.enhanced_client = None
     
+    def precmd(self, line: str) -> str:
+        """Finish pending artifact writes before running the next command"""
+        _flush_artifacts()
+        return line
+    
     def do_create(self, name: str):
         """Create a new enhanced project: create <project_name>"""
         if not name:
             print("❌ Please provide a project name")
             return
         
-        self.current_project = EnhancedProject(name)
-        self.prompt = f'({name}) > '
+        self._flush_project()
+        self._set_project(EnhancedProject(name))
         print(f"✅ Created enhanced project: {name}")
         
         # Check if files already exist in the directory
@@ -703,8 +1398,8 @@ Type 'help' for commands or 'help <command>' for details.
             print(f"❌ Project '{name}' not found")
             return
         
-        self.current_project = EnhancedProject(name)
-        self.prompt = f'({name}) > '
+        self._flush_project()
+        self._set_project(EnhancedProject(name))
         print(f"✅ Opened enhanced project: {name}")
         
         # Auto-sync files
@@ -784,39 +1479,47 @@ Type 'help' for commands or 'help <command>' for details.
             return
         
         # Get project context with token counting
-        context = ""
         context_tokens = 0
+        sections = []  # (filename, content) pairs for the client
+        plain_context = ""  # sent outside the file code blocks (listing, skipped-files note)
         
         if include_context and self.current_project:
             if selected_files:
                 # Build context from selected files only
-                context_parts = [f"Project: {self.current_project.name} (Selected Files)\n{'='*60}\n"]
                 included_files = []
                 
+                message_tokens = self.estimate_tokens(message)
+                
                 for filename in selected_files:
                     try:
-                        content = self.current_project.get_file_content(filename)
-                        file_section = f"\n--- File: {filename} ---\n{content}\n"
-                        file_tokens = self.estimate_tokens(file_section)
+                        # Content tokens come from the per-file cache
+                        header = f"\n--- File: {filename} ---\n"
+                        file_tokens = self.current_project.get_file_tokens(filename)[0] + _estimate_tokens(header)
                         
                         # Check if adding this file would exceed limit
-                        if context_tokens + file_tokens + self.estimate_tokens(message) > 190000:
+                        if context_tokens + file_tokens + message_tokens > 190000:
                             print(f"⚠️  Skipping {filename} (would exceed token limit)")
                             continue
                         
-                        context_parts.append(file_section)
+                        content = self.current_project.get_file_content(filename)
                         context_tokens += file_tokens
                         included_files.append(filename)
+                        sections.append((filename, content))
                         
                     except Exception as e:
                         print(f"⚠️  Could not include {filename}: {e}")
                 
-                context = "".join(context_parts)
                 print(f"📎 Included {len(included_files)} files (~{context_tokens:,} tokens)")
                 
+            elif _LISTING_RE.match(message):
+                # Questions about which files exist don't need file contents
+                plain_context = self.current_project.get_file_listing()
+                context_tokens = self.estimate_tokens(plain_context)
+                print("📋 Sending file names and sizes only (listing question)")
+                
             else:
                 # Try to include all files with token limit checking
-                context = self.current_project.get_project_context()
+                context, file_count, truncated, skipped = self.current_project.get_project_context()
                 context_tokens = self.estimate_tokens(context)
                 
                 # Check if we're over the limit
@@ -828,7 +1531,9 @@ Type 'help' for commands or 'help <command>' for details.
                     print("   • Use 'tokens' command to see file sizes")
                     return
                 
-                print(f"📎 Including {len(self.current_project.list_files())} files (~{context_tokens:,} tokens)")
+                sections, plain_context = self.current_project.get_context_sections()
+                print(f"📎 Including {file_count} files (~{context_tokens:,} tokens)")
+                self._print_context_limits(truncated, skipped)
         
         else:
             if not include_context:
@@ -851,25 +1556,27 @@ Type 'help' for commands or 'help <command>' for details.
         try:
             model_id = self.MODELS[self.current_model]
             
-            # Use enhanced client for website-like responses
+            # Format response with better spacing
+            print(f"\n{'='*70}")
+            print(f"🤖 Claude ({self.current_model}) - Enhanced Response:")
+            print(f"{'='*70}\n")
+            
+            # Use enhanced client for website-like responses, streamed to the terminal
             response = self.enhanced_client.create_message_with_context(
                 message=message,
-                context=context,
-                model=model_id
+                sections=sections,
+                model=model_id,
+                on_text=self._print_stream,
+                plain_context=plain_context
             )
             
             response_text = response.content[0].text
-            
-            # Format response with better spacing
-            print(f"\n{'='*70}")
-            print(f"🤖 Claude ({self.current_model}) - Enhanced Response:")
-            print(f"{'='*70}\n")
-            print(response_text)
-            print(f"\n{'='*70}\n")
+            word_count = len(response_text.split())
+            print(f"\n\n{'='*70}\n")
             
             # Extract and create artifacts if in a project
             artifacts = []
-            if self.current_project and isinstance(self.current_project, EnhancedProject):
+            if self._is_enhanced:
                 artifacts = self.current_project.artifact_manager.extract_code_blocks(response_text)
                 
                 if artifacts:
@@ -881,16 +1588,19 @@ Type 'help' for commands or 'help <command>' for details.
                 conv_file = self.current_project.save_enhanced_conversation(
                     message=message,
                     response=response_text,
-                    artifacts=artifacts
+                    artifacts=artifacts,
+                    word_count=word_count
                 )
                 print(f"💾 Enhanced conversation saved: {conv_file}")
                 
             # Show response metrics
             print(f"\n📊 Response Metrics:")
             print(f"   • Length: {len(response_text)} characters")
-            print(f"   • Words: {len(response_text.split())} words")
+            print(f"   • Words: {word_count} words")
             print(f"   • Code artifacts: {len(artifacts)}")
                 
+        except KeyboardInterrupt:
+            print("\n❌ Cancelled")
         except Exception as e:
             print(f"❌ Error: {e}")
             import traceback
@@ -902,30 +1612,40 @@ Type 'help' for commands or 'help <command>' for details.
             print("❌ No project open")
             return
             
-        if not isinstance(self.current_project, EnhancedProject):
+        if not self._is_enhanced:
             print("❌ Current project doesn't support artifacts")
             return
         
-        artifacts_path = self.current_project.project_path / "artifacts"
+        artifacts_path = self._artifacts_path
         if not artifacts_path.exists():
             print("No artifacts created yet")
             return
-            
-        artifacts = list(artifacts_path.iterdir())
-        if artifacts:
-            print(f"\n📦 Artifacts in {self.current_project.name}:")
-            print(f"{'Name':<50} {'Size':>10} {'Modified'}")
-            print("-" * 75)
-            for artifact in sorted(artifacts):
-                if artifact.is_file():
-                    size = self._format_size(artifact.stat().st_size)
-                    modified = datetime.fromtimestamp(artifact.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-                    print(f"{artifact.name:<50} {size:>10} {modified}")
-            print(f"\nTotal: {len(artifacts)} artifacts")
+        
+        count, total_bytes = self._print_artifact_table(
+            artifacts_path, f"Artifacts in {self.current_project.name}:")
+        if count:
+            print(f"\nTotal: {count} artifacts ({_format_size(total_bytes)})")
             print("Tip: Use 'view <filename>' to see artifact content")
         else:
             print("No artifacts created yet")
     
+    def _print_artifact_table(self, path: Path, title: str = "Artifacts:",
+                              header_emoji: str = "📦") -> Tuple[int, int]:
+        """Print the artifact table for path and return (count, total_size)"""
+        rows = []
+        total_size = 0
+        for name, size, mtime_ns in _scan_dir(path):
+            total_size += size
+            modified = time.strftime(_MTIME_FMT, time.localtime(mtime_ns / 1e9))
+            rows.append(_ARTIFACT_ROW(name, _format_size(size), modified) + "\n")
+        
+        if rows:
+            print(f"\n{header_emoji} {title}")
+            print(_ARTIFACT_ROW('Name', 'Size', 'Modified'))
+            print("-" * 75)
+            sys.stdout.write("".join(rows))
+        return len(rows), total_size
+    
     def do_list(self, _):
         """List all files and artifacts in the current project"""
         if not self.current_project:
@@ -936,29 +1656,20 @@ Type 'help' for commands or 'help <command>' for details.
         files = self.current_project.list_files()
         if files:
             print(f"\n📄 Project Files:")
-            print(f"{'Name':<40} {'Size':>10} {'Modified'}")
+            print(_FILE_ROW('Name', 'Size', 'Modified'))
             print("-" * 65)
-            for name, size, modified in files:
-                size_str = self._format_size(size)
-                print(f"{name:<40} {size_str:>10} {modified}")
+            rows = [_FILE_ROW(name, _format_size(size), modified) + "\n"
+                    for name, size, modified in files]
+            sys.stdout.write("".join(rows))
         else:
             print("\n📄 No project files")
         
         # List artifacts if using enhanced project
-        if isinstance(self.current_project, EnhancedProject):
-            artifacts_path = self.current_project.project_path / "artifacts"
+        if self._is_enhanced:
+            artifacts_path = self._artifacts_path
             if artifacts_path.exists():
-                artifacts = list(artifacts_path.iterdir())
-                if artifacts:
-                    print(f"\n📦 Artifacts:")
-                    print(f"{'Name':<50} {'Size':>10} {'Modified'}")
-                    print("-" * 75)
-                    for artifact in sorted(artifacts):
-                        if artifact.is_file():
-                            size = self._format_size(artifact.stat().st_size)
-                            modified = datetime.fromtimestamp(artifact.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-                            print(f"{artifact.name:<50} {size:>10} {modified}")
-                else:
+                count, _ = self._print_artifact_table(artifacts_path)
+                if not count:
                     print("\n📦 No artifacts")
         
         print("\nTip: Use 'view <filename>' to see any file or artifact content")
@@ -978,12 +1689,13 @@ Type 'help' for commands or 'help <command>' for details.
         destination = parts[1] if len(parts) > 1 else f"exported_{export_type}"
         
         if export_type == "artifacts":
-            if not isinstance(self.current_project, EnhancedProject):
+            if not self._is_enhanced:
                 print("❌ Current project doesn't support artifacts")
                 return
             
-            artifacts_path = self.current_project.project_path / "artifacts"
-            if not artifacts_path.exists() or not list(artifacts_path.iterdir()):
+            artifacts_path = self._artifacts_path
+            items = _scan_dir(artifacts_path) if artifacts_path.exists() else []
+            if not items:
                 print("No artifacts to export")
                 return
             
@@ -991,7 +1703,8 @@ Type 'help' for commands or 'help <command>' for details.
             file_type = "artifacts"
         elif export_type == "files":
             source_path = self.current_project.files_path
-            if not list(source_path.iterdir()):
+            items = _scan_dir(source_path)
+            if not items:
                 print("No files to export")
                 return
             file_type = "files"
@@ -1001,16 +1714,17 @@ Type 'help' for commands or 'help <command>' for details.
         
         # Create destination directory
         dest_path = Path(destination).expanduser()
+        if dest_path.resolve() == source_path.resolve():
+            print(f"❌ Cannot export {file_type} into their own directory")
+            return
         dest_path.mkdir(parents=True, exist_ok=True)
         
-        # Copy all items
-        copied = 0
-        for item in source_path.iterdir():
-            if item.is_file():
-                shutil.copy2(item, dest_path)
-                copied += 1
+        # Copy all items concurrently
+        with ThreadPoolExecutor(max_workers=min(32, len(items))) as pool:
+            list(pool.map(lambda item: _fast_copy(source_path / item[0], dest_path / item[0]), items))
+        copied = len(items)
         
-        print(f"✅ Exported {copied} {file_type} to: {dest_path.absolute()}")
+        print(f"✅ Exported {copied} {file_type} to: {os.path.abspath(dest_path)}")
     
     def do_clear_artifacts(self, _):
         """Clear all artifacts from the current project (with confirmation)"""
@@ -1018,16 +1732,16 @@ Type 'help' for commands or 'help <command>' for details.
             print("❌ No project open")
             return
             
-        if not isinstance(self.current_project, EnhancedProject):
+        if not self._is_enhanced:
             print("❌ Current project doesn't support artifacts")
             return
         
-        artifacts_path = self.current_project.project_path / "artifacts"
+        artifacts_path = self._artifacts_path
         if not artifacts_path.exists():
             print("No artifacts to clear")
             return
         
-        artifacts = list(artifacts_path.iterdir())
+        artifacts = _scan_dir(artifacts_path)
         if not artifacts:
             print("No artifacts to clear")
             return
@@ -1036,192 +1750,22 @@ Type 'help' for commands or 'help <command>' for details.
         confirm = input("Are you sure? (yes/no): ").lower()
         
         if confirm == "yes":
+            artifacts_dir = os.fspath(artifacts_path)
             removed = 0
-            for artifact in artifacts:
-                if artifact.is_file():
-                    artifact.unlink()
-                    removed += 1
+            for name, _, _ in artifacts:
+                os.unlink(os.path.join(artifacts_dir, name))
+                removed += 1
             print(f"✅ Removed {removed} artifacts")
         else:
             print("❌ Cancelled")
     
     def do_help_chat(self, _):
         """Show detailed help for chat command options"""
-        print("""
-💬 Chat Command Options:
-========================
-
-BASIC USAGE:
-  chat <message>                    - Chat with all project files included
-
-TOKEN-AWARE OPTIONS:
-  chat -n <message>                 - No file context (fastest, no token limit issues)
-  chat -s file1,file2 -- <message>  - Include only specific files
-  
-INPUT OPTIONS:
-  chat -f <filename>                - Read message from a file in your project
-  chat -m                           - Multi-line mode (end with 'EOF')
-
-EXAMPLES:
-  chat Tell me about this code
-  chat -n What are TBI assessment best practices?
-  chat -s main.py,utils.py -- Analyze these two files
-  chat -f long_prompt.txt
-  chat -m
-  ... Type your multi-line
-  ... message here
-  EOF
-
-TOKEN MANAGEMENT:
-  Use 'tokens' command to see which files use the most tokens
-  Token limit: 200,000 (including ~2,000 for system prompts)
-
-💡 TIP: If you hit token limits, use -n or -s options to control context
-""")
-    
-    def do_help_artifacts(self, _):
-        """Show help for artifact commands"""
-        print("""
-📦 Artifact Management Commands:
-================================
-
-VIEW & LIST:
-  view <filename>         - View any file or artifact content
-  list                    - List all files AND artifacts
-  artifacts              - List only artifacts with details
-  files                  - List only project files
-
-EXPORT & MANAGE:
-  export artifacts <path> - Export all artifacts to a directory
-  export files <path>    - Export all project files to a directory
-  clear_artifacts        - Remove all artifacts (with confirmation)
-
-QUICK ACCESS:
-  open_project_folder    - Open project folder in file manager
-
-EXAMPLES:
-  view llmprovider_20250802_161611.python    # View an artifact
-  export artifacts ~/Desktop/my_code         # Export to Desktop
-  list                                       # See everything
-
-💡 TIP: Artifacts are stored in: Claude_Projects/<project_name>/artifacts/
-""")
-    
-    def do_help(self, arg):
-        """Show help for commands"""
-        if arg:
-            # Call parent help for specific command
-            super().do_help(arg)
-        else:
-            # Show custom organized help
-            print("""
-🎯 Claude Projects Enhanced CLI - Command Reference
-================================================
-
-PROJECT MANAGEMENT:
-  create <name>         - Create a new project
-  open <name>           - Open existing project
-  projects              - List all projects
-  summary               - Show project statistics
-
-FILE MANAGEMENT:
-  add <path>            - Add file to project
-  files                 - List project files
-  remove <filename>     - Remove file from project
-  update                - Sync files from directory
-  view <filename>       - View file or artifact content
-
-TOKEN MANAGEMENT:
-  tokens                - Show token analysis for all files
-  
-CHAT & AI:
-  chat <message>        - Chat with Claude about your project
-  chat -n <message>     - Chat without file context
-  chat -s files -- msg  - Chat with specific files only
-  model <name>          - Switch model (opus/sonnet/haiku)
-  models                - List available models
-
-ARTIFACTS:
-  artifacts             - List all artifacts
-  export artifacts <p>  - Export artifacts to directory
-  clear_artifacts       - Remove all artifacts
-  
-UTILITIES:
-  conversations         - List chat history
-  open_project_folder   - Open in file manager
-  clear                 - Clear screen
-  exit/quit            - Exit CLI
-
-HELP:
-  help                  - Show this message
-  help <command>        - Detailed help for command
-  help_chat            - Chat command options
-  help_artifacts       - Artifact management help
-
-💡 Quick Start:
-  1. create my_project
-  2. add file1.py file2.py
-  3. tokens  (check token usage)
-  4. chat Analyze this code
-""")
-💬 Chat Command Options:
-========================
-
-BASIC USAGE:
-  chat <message>                    - Chat with all project files included
-
-TOKEN-AWARE OPTIONS:
-  chat -n <message>                 - No file context (fastest, no token limit issues)
-  chat -s file1,file2 -- <message>  - Include only specific files
-  
-INPUT OPTIONS:
-  chat -f <filename>                - Read message from a file in your project
-  chat -m                           - Multi-line mode (end with 'EOF')
-
-EXAMPLES:
-  chat Tell me about this code
-  chat -n What are TBI assessment best practices?
-  chat -s main.py,utils.py -- Analyze these two files
-  chat -f long_prompt.txt
-  chat -m
-  ... Type your multi-line
-  ... message here
-  EOF
-
-TOKEN MANAGEMENT:
-  Use 'tokens' command to see which files use the most tokens
-  Token limit: 200,000 (including ~2,000 for system prompts)
-
-💡 TIP: If you hit token limits, use -n or -s options to control context
-""")
+        print(_HELP_CHAT)
     
     def do_help_artifacts(self, _):
         """Show help for artifact commands"""
-        print("""
-📦 Artifact Management Commands:
-================================
-
-VIEW & LIST:
-  view <filename>         - View any file or artifact content
-  list                    - List all files AND artifacts
-  artifacts              - List only artifacts with details
-  files                  - List only project files
-
-EXPORT & MANAGE:
-  export artifacts <path> - Export all artifacts to a directory
-  export files <path>    - Export all project files to a directory
-  clear_artifacts        - Remove all artifacts (with confirmation)
-
-QUICK ACCESS:
-  open_project_folder    - Open project folder in file manager
-
-EXAMPLES:
-  view llmprovider_20250802_161611.python    # View an artifact
-  export artifacts ~/Desktop/my_code         # Export to Desktop
-  list                                       # See everything
-
-💡 TIP: Artifacts are stored in: Claude_Projects/<project_name>/artifacts/
-""")
+        print(_ARTIFACT_HELP)
     
     def do_help(self, arg):
         """Show help for commands"""
@@ -1230,56 +1774,7 @@ EXAMPLES:
             super().do_help(arg)
         else:
             # Show custom organized help
-            print("""
-🎯 Claude Projects Enhanced CLI - Command Reference
-================================================
-
-PROJECT MANAGEMENT:
-  create <name>          - Create a new project
-  open <name>           - Open existing project
-  projects              - List all projects
-  summary               - Show project statistics
-
-FILE MANAGEMENT:
-  add <path>            - Add file to project
-  files                 - List project files
-  remove <filename>     - Remove file from project
-  update                - Sync files from directory
-  view <filename>       - View file or artifact content
-
-TOKEN MANAGEMENT:
-  tokens                - Show token analysis for all files
-  
-CHAT & AI:
-  chat <message>        - Chat with Claude about your project
-  chat -n <message>     - Chat without file context
-  chat -s files -- msg  - Chat with specific files only
-  model <name>          - Switch model (opus/sonnet/haiku)
-  models                - List available models
-
-ARTIFACTS:
-  artifacts             - List all artifacts
-  export artifacts <p>  - Export artifacts to directory
-  clear_artifacts       - Remove all artifacts
-  
-UTILITIES:
-  conversations         - List chat history
-  open_project_folder   - Open in file manager
-  clear                 - Clear screen
-  exit/quit            - Exit CLI
-
-HELP:
-  help                  - Show this message
-  help <command>        - Detailed help for command
-  help_chat            - Chat command options
-  help_artifacts       - Artifact management help
-
-💡 Quick Start:
-  1. create my_project
-  2. add file1.py file2.py
-  3. tokens  (check token usage)
-  4. chat Analyze this code
-""")
+            print(_HELP)
     
     def do_summary(self, _):
         """Show project summary including files, artifacts, and conversations"""
@@ -1291,28 +1786,28 @@ HELP:
         print("=" * 60)
         
         # Count files
-        files = self.current_project.list_files()
-        total_file_size = sum(f[1] for f in files)
-        print(f"📄 Files: {len(files)} ({self._format_size(total_file_size)})")
+        files = _scan_dir(self.current_project.files_path)
+        total_file_size = sum(size for _, size, _ in files)
+        print(f"📄 Files: {len(files)} ({_format_size(total_file_size)})")
         
         # Count artifacts if enhanced project
         artifact_count = 0
         artifact_size = 0
-        if isinstance(self.current_project, EnhancedProject):
-            artifacts_path = self.current_project.project_path / "artifacts"
+        if self._is_enhanced:
+            artifacts_path = self._artifacts_path
             if artifacts_path.exists():
-                artifacts = list(artifacts_path.iterdir())
-                artifact_count = len([a for a in artifacts if a.is_file()])
-                artifact_size = sum(a.stat().st_size for a in artifacts if a.is_file())
+                artifacts = _scan_dir(artifacts_path)
+                artifact_count = len(artifacts)
+                artifact_size = sum(size for _, size, _ in artifacts)
         
-        print(f"📦 Artifacts: {artifact_count} ({self._format_size(artifact_size)})")
+        print(f"📦 Artifacts: {artifact_count} ({_format_size(artifact_size)})")
         
         # Count conversations
         conversations = self.current_project.list_conversations()
         print(f"💬 Conversations: {len(conversations)}")
         
         # Project location
-        print(f"\n📁 Location: {self.current_project.project_path.absolute()}")
+        print(f"\n📁 Location: {os.path.abspath(self.current_project.project_path)}")
         
         # Quick tips based on content
         print("\n💡 Quick actions:")
@@ -1324,17 +1819,8 @@ HELP:
         print("   • open_project_folder  - Open in file manager")
     
     def estimate_tokens(self, text: str) -> int:
-        """Estimate token count (rough approximation without tiktoken)"""
-        # Rough estimation: ~4 characters per token on average
-        # This is a simplified approach, actual tokenization is more complex
-        word_count = len(text.split())
-        char_count = len(text)
-        
-        # Use a weighted average of word and character counts
-        # Most tokens are ~0.75 words or ~4 characters
-        estimated_tokens = int((word_count / 0.75 + char_count / 4) / 2)
-        
-        return estimated_tokens
+        """Estimate token count (tiktoken if installed, else a heuristic)"""
+        return _estimate_tokens_cached(text)
     
     def do_tokens(self, _):
         """Show token count analysis for current project"""
@@ -1347,20 +1833,14 @@ HELP:
         print("Note: Token counts are estimates. Actual usage may vary.")
         print("=" * 70)
         
-        total_tokens = 0
-        file_data = []
-        
         # Analyze each file
-        for filepath in sorted(self.current_project.files_path.iterdir()):
-            if filepath.is_file():
-                try:
-                    content = self.current_project.get_file_content(filepath.name)
-                    tokens = self.estimate_tokens(content)
-                    total_tokens += tokens
-                    file_data.append((filepath.name, tokens, len(content)))
-                except Exception as e:
-                    file_data.append((filepath.name, 0, 0))
-                    print(f"⚠️  Error reading {filepath.name}: {e}")
+        file_data = []
+        total_tokens = 0
+        for name, tokens, chars, error in self.current_project.token_counts():
+            if error:
+                print(f"⚠️  Error reading {name}: {error}")
+            total_tokens += tokens
+            file_data.append((name, tokens, chars))
         
         # Sort by token count (highest first)
         file_data.sort(key=lambda x: x[1], reverse=True)
@@ -1369,8 +1849,9 @@ HELP:
         print(f"\n{'File':<40} {'Tokens':>12} {'Size':>10}")
         print("-" * 65)
         
+        rows = []
         for filename, tokens, size in file_data:
-            size_str = self._format_size(size)
+            size_str = _format_size(size)
             # Color code based on token count
             if tokens > 50000:
                 prefix = "🔴"  # Red - very large
@@ -1379,7 +1860,8 @@ HELP:
             else:
                 prefix = "🟢"  # Green - ok
             
-            print(f"{prefix} {filename:<38} {tokens:>11,} {size_str:>10}")
+            rows.append(_TOKEN_ROW(prefix, filename, tokens, size_str) + "\n")
+        sys.stdout.write("".join(rows))
         
         print("-" * 65)
         print(f"{'TOTAL':<40} {total_tokens:>11,}")
@@ -1391,6 +1873,9 @@ HELP:
         print(f"\n📝 Context overhead (prompts, formatting): ~{context_overhead:,} tokens")
         print(f"📊 Estimated total with overhead: ~{total_with_overhead:,} tokens")
         print(f"📏 Token limit: 200,000")
+        print(f"✂️  Chat sends at most {self.current_project.MAX_PER_FILE_BYTES // 1024} KB per file "
+              f"and {self.current_project.MAX_TOTAL_CONTEXT_BYTES // 1024} KB in total; "
+              "use 'chat -s' for whole files")
         
         # Status indicator
         percentage = (total_with_overhead / 200000) * 100
@@ -1449,8 +1934,8 @@ HELP:
             pass  # Try artifacts next
         
         # If not found in files, try artifacts
-        if isinstance(self.current_project, EnhancedProject):
-            artifact_path = self.current_project.project_path / "artifacts" / filename
+        if self._is_enhanced:
+            artifact_path = self._artifacts_path / filename
             if artifact_path.exists():
                 try:
                     content = artifact_path.read_text(encoding='utf-8')
@@ -1474,21 +1959,21 @@ HELP:
         # Show suggestions
         suggestions = []
         
+        needle = filename.lower()
+        
         # Check files directory
-        files = self.current_project.list_files()
-        if files:
-            file_names = [f[0] for f in files]
-            for fname in file_names:
-                if filename.lower() in fname.lower():
-                    suggestions.append(('file', fname))
+        for fname, _, _ in _scan_dir(self.current_project.files_path):
+            if needle in fname.lower():
+                suggestions.append(('file', fname))
         
         # Check artifacts directory
-        if isinstance(self.current_project, EnhancedProject):
-            artifacts_path = self.current_project.project_path / "artifacts"
+        if self._is_enhanced:
+            artifacts_path = self._artifacts_path
             if artifacts_path.exists():
-                for artifact in artifacts_path.iterdir():
-                    if artifact.is_file() and filename.lower() in artifact.name.lower():
-                        suggestions.append(('artifact', artifact.name))
+                with os.scandir(artifacts_path) as it:
+                    for entry in it:
+                        if needle in entry.name.lower() and entry.is_file():
+                            suggestions.append(('artifact', entry.name))
         
         if suggestions:
             print("\nDid you mean:")
@@ -1511,14 +1996,7 @@ HELP:
             print(f"✅ Removed: {filename}")
             
             # Show updated token count
-            total_tokens = 0
-            for filepath in self.current_project.files_path.iterdir():
-                if filepath.is_file():
-                    try:
-                        content = self.current_project.get_file_content(filepath.name)
-                        total_tokens += self.estimate_tokens(content)
-                    except:
-                        pass
+            total_tokens = sum(count[1] for count in self.current_project.token_counts())
             
             print(f"📊 Project now has ~{total_tokens:,} tokens")
         else: